@@ -1,14 +1,26 @@
 import os
 import json
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import time
-import concurrent.futures
-from functools import lru_cache
 import logging
-from typing import List, Dict, Any
-import glob
+import hashlib
+import sqlite3
+import re
+import sys
+from typing import List, Dict, Any, Iterable, Iterator, Mapping, Tuple, BinaryIO
+from pathlib import Path
+from contextlib import closing, contextmanager
+
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:  # fall back to the stdlib encoder
+    orjson = None
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -21,16 +33,57 @@ load_dotenv()
 TOKEN = os.getenv('PRODUCT_HUNT_TOKEN')
 logger.info(f"Token loaded: {TOKEN[:5]}...")  # Only print first 5 chars for security
 
+# Directory for product batches, the summary and the filter cache
+DATA_DIR = Path('data')
+
+# Write buffer for output files, large enough that a typical batch is flushed in a few syscalls
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+# Number of days of launches to fetch
+LOOKBACK_DAYS = 14
+
+# Delay between pages when the API sends no rate limit headers
+MIN_PAGE_DELAY = 1
+
 # API URL
 GRAPHQL_URL = 'https://api.producthunt.com/v2/api/graphql'
 
-# GraphQL query to fetch products with topics
+HEADERS = {
+    'Accept': 'application/json',
+    'Content-Type': 'application/json',
+    'Authorization': f'Bearer {TOKEN}',
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Origin': 'https://api.producthunt.com',
+    'Referer': 'https://api.producthunt.com'
+}
+
+# Persistent session shared by all page requests
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+SESSION.mount(
+    'https://',
+    HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=10,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=[429, 502, 503, 504],
+            allowed_methods=None
+        )
+    )
+)
+
+# GraphQL query to fetch products with topics.
+# Only request fields that are used: id keys the saved batch, description and
+# topics drive the consumer filter, the rest is copied into the summary.
 QUERY = '''
-{
+query Posts($postedAfter: DateTime, $after: String) {
   posts(
     first: 20,
     featured: true,
-    postedAfter: "''' + (datetime.now() - timedelta(days=14)).strftime('%Y-%m-%d') + '''"
+    postedAfter: $postedAfter,
+    after: $after
   ) {
     edges {
       node {
@@ -59,14 +112,14 @@ QUERY = '''
 '''
 
 # B2B/Enterprise categories to exclude
-EXCLUDED_CATEGORIES = {
+EXCLUDED_CATEGORIES = frozenset(map(sys.intern, {
     'Developer Tools', 'SaaS', 'Enterprise', 'B2B', 'Business Intelligence',
     'Analytics', 'Operations', 'Human Resources', 'Legal', 'Accounting',
     'Fintech', 'Payments', 'Security', 'Infrastructure', 'API', 'Database',
     'Cloud Computing', 'DevOps', 'GitHub', 'Development', 'Software Engineering',
     'No-Code', 'Maker Tools', 'Design Tools', 'Marketing automation',
     'Customer Communication', 'Sales', 'Business', 'Enterprise Software'
-}
+}))
 
 # Keywords that suggest B2B/enterprise focus
 B2B_KEYWORDS = {
@@ -75,95 +128,268 @@ B2B_KEYWORDS = {
     'developer', 'development', 'infrastructure', 'security'
 }
 
-@lru_cache(maxsize=1000)
-def is_consumer_product(product_id: str, topics: tuple, description: str, tagline: str) -> bool:
-    """Determine if a product is consumer-focused based on its topics and description."""
-    # Convert topics set to tuple for hashing
-    topics_set = set(topics)
-    
-    # Check if any excluded categories are present
-    if topics_set & EXCLUDED_CATEGORIES:
-        return False
-    
-    # Check description and tagline for B2B keywords
-    text = (description + ' ' + tagline).lower()
-    if any(keyword in text for keyword in B2B_KEYWORDS):
-        return False
-    
-    return True
-
-def fetch_page(cursor: str = None) -> Dict[str, Any]:
-    """Fetch a single page of products from the API."""
-    current_query = QUERY
-    if cursor:
-        current_query = current_query.replace(
-            'posts(',
-            f'posts(after: "{cursor}",'
-        )
+# Single-pass matcher for B2B_KEYWORDS, compiled once at import. Keywords must start a
+# word, which keeps short ones from matching inside other words ('api' in 'therapist'),
+# but may run on into inflections and compounds ('businesses', 'teamwork') as the
+# original substring check did; a trailing 'y' also covers 'ies' ('securities')
+B2B_KEYWORDS_PATTERN = re.compile(
+    r'\b(?:' + '|'.join(
+        re.escape(keyword[:-1]) + '(?:y|ies)' if keyword.endswith('y') else re.escape(keyword)
+        for keyword in sorted(B2B_KEYWORDS)
+    ) + ')',
+    re.IGNORECASE
+)
+
+# On-disk cache of filter results by product id; entries are tied to the criteria hash
+# so changing EXCLUDED_CATEGORIES or B2B_KEYWORDS invalidates them
+FILTER_CACHE_FILE = DATA_DIR / 'filter_cache.sqlite'
+FILTER_CACHE_SCHEMA_VERSION = 2
+FILTER_CRITERIA_HASH = hashlib.sha256(
+    '\n'.join([*sorted(EXCLUDED_CATEGORIES), '', B2B_KEYWORDS_PATTERN.pattern]).encode('utf-8')
+).hexdigest()
+
+def pooled_topic_names(product: Dict[str, Any], pool: Dict[str, str]) -> List[str]:
+    """Return the product's topic names, swapping each for its shared pooled instance."""
+    names = []
+    for topic in product['topics']['edges']:
+        node = topic['node']
+        name = pool.get(node['name'])
+        if name is None:
+            name = pool[node['name']] = sys.intern(node['name'])
+        # Write back so the saved products share one string per topic as well
+        node['name'] = name
+        names.append(name)
+    return names
+
+def products_frame(products: List[Dict[str, Any]]) -> pd.DataFrame:
+    """Lay out the fields used for filtering and the summary as one column per field."""
+    topic_pool = {}
+    return pd.DataFrame({
+        'id': [product['id'] for product in products],
+        'name': [product['name'] for product in products],
+        'url': [product['url'] for product in products],
+        'createdAt': [product['createdAt'] for product in products],
+        'topics': [pooled_topic_names(product, topic_pool) for product in products],
+        'description': [product.get('description') for product in products],
+        'tagline': [product.get('tagline') for product in products],
+        'votesCount': [product['votesCount'] for product in products],
+    })
+
+def consumer_mask(frame: pd.DataFrame) -> pd.Series:
+    """Flag the rows of a products frame that look consumer-focused."""
+    # isdisjoint short-circuits on the first excluded topic without building a set
+    has_excluded_topic = ~frame['topics'].map(EXCLUDED_CATEGORIES.isdisjoint).astype(bool)
     
-    headers = {
-        'Accept': 'application/json',
-        'Content-Type': 'application/json',
-        'Authorization': f'Bearer {TOKEN}',
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-        'Origin': 'https://api.producthunt.com',
-        'Referer': 'https://api.producthunt.com'
-    }
+    # Check description and tagline for B2B keywords; scanning each column in place
+    # avoids allocating a concatenated copy of every product's text
+    has_b2b_keyword = (
+        frame['description'].fillna('').str.contains(B2B_KEYWORDS_PATTERN, regex=True)
+        | frame['tagline'].fillna('').str.contains(B2B_KEYWORDS_PATTERN, regex=True)
+    )
     
+    return ~has_excluded_topic & ~has_b2b_keyword
+
+def filter_input_digest(description: str, tagline: str, topics: List[str]) -> str:
+    """Hash the fields consumer_mask reads, so edited products miss the filter cache."""
+    text = '\x00'.join([description or '', tagline or '', '\x1f'.join(topics)])
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+def cached_consumer_mask(frame: pd.DataFrame) -> pd.Series:
+    """Compute consumer_mask, reusing results stored on disk by earlier runs."""
     try:
-        response = requests.post(
+        os.makedirs(DATA_DIR, exist_ok=True)
+        with closing(sqlite3.connect(FILTER_CACHE_FILE)) as conn, conn:
+            if conn.execute('PRAGMA user_version').fetchone()[0] != FILTER_CACHE_SCHEMA_VERSION:
+                # Earlier layouts lack the digest and last_seen columns, so start over
+                conn.execute('DROP TABLE IF EXISTS filter_cache')
+                conn.execute(f'PRAGMA user_version = {FILTER_CACHE_SCHEMA_VERSION}')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS filter_cache '
+                '(id TEXT PRIMARY KEY, criteria TEXT NOT NULL, digest TEXT NOT NULL, '
+                'is_consumer INTEGER NOT NULL, last_seen REAL NOT NULL)'
+            )
+            now = time.time()
+            # Evict results from other filter criteria and products no longer inside the fetch window
+            conn.execute(
+                'DELETE FROM filter_cache WHERE criteria != ? OR last_seen < ?',
+                (FILTER_CRITERIA_HASH, now - LOOKBACK_DAYS * 24 * 60 * 60)
+            )
+            
+            ids = frame['id'].tolist()
+            digests = [
+                filter_input_digest(description, tagline, topics)
+                for description, tagline, topics in zip(frame['description'], frame['tagline'], frame['topics'])
+            ]
+            cached = {}
+            # Stay below SQLite's bound parameter limit
+            for start in range(0, len(ids), 500):
+                batch = ids[start:start + 500]
+                cached.update(
+                    (product_id, (digest, is_consumer))
+                    for product_id, digest, is_consumer in conn.execute(
+                        f"SELECT id, digest, is_consumer FROM filter_cache WHERE id IN ({','.join('?' * len(batch))})",
+                        batch
+                    )
+                )
+            
+            # A stored result only counts when the product's filter inputs are unchanged
+            hits = pd.Series(
+                [cached.get(product_id, (None,))[0] == digest for product_id, digest in zip(ids, digests)],
+                index=frame.index,
+                dtype=bool
+            )
+            mask = pd.Series(
+                [bool(cached[product_id][1]) if hit else False for product_id, hit in zip(ids, hits)],
+                index=frame.index,
+                dtype=bool
+            )
+            if not hits.all():
+                mask[~hits] = consumer_mask(frame[~hits]).to_numpy(dtype=bool)
+            
+            # Rewrite every row seen in this run so last_seen keeps live products from being evicted
+            conn.executemany(
+                'INSERT OR REPLACE INTO filter_cache (id, criteria, digest, is_consumer, last_seen) '
+                'VALUES (?, ?, ?, ?, ?)',
+                [(product_id, FILTER_CRITERIA_HASH, digest, int(is_consumer), now)
+                 for product_id, digest, is_consumer in zip(ids, digests, mask)]
+            )
+            logger.info(f"Filter cache hits: {int(hits.sum())}/{len(frame)}")
+            return mask
+    except sqlite3.Error as e:
+        logger.warning(f"Filter cache unavailable, filtering without it: {str(e)}")
+        return consumer_mask(frame)
+
+def wait_for_rate_limit(headers: Mapping[str, str]) -> None:
+    """Pause before the next page, for the reset window once the API reports it exhausted."""
+    remaining = headers.get('X-Rate-Limit-Remaining')
+    reset = headers.get('X-Rate-Limit-Reset')
+    try:
+        if int(remaining) > 0:
+            return
+        delay = max(int(reset), 0)
+    except (TypeError, ValueError):
+        # No usable rate limit headers, keep a fixed pace between pages
+        time.sleep(MIN_PAGE_DELAY)
+        return
+    logger.info(f"Rate limit reached, waiting {delay}s for reset...")
+    time.sleep(delay)
+
+def fetch_page(posted_after: str, cursor: str = None) -> Tuple[Dict[str, Any], Mapping[str, str]]:
+    """Fetch a single page of products posted after the given date, with the response headers."""
+    try:
+        # Reuse the keep-alive connection so the TLS handshake is paid once per run
+        response = SESSION.post(
             GRAPHQL_URL,
-            json={'query': current_query},
-            headers=headers,
+            json={'query': QUERY, 'variables': {'postedAfter': posted_after, 'after': cursor}},
             timeout=10
         )
         response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
+        if orjson is not None:
+            return orjson.loads(response.content), response.headers
+        return response.json(), response.headers
+    except (requests.exceptions.RequestException, ValueError) as e:
         logger.error(f"Error fetching page: {str(e)}")
-        return None
-
-def process_products(products: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    """Process and filter products."""
-    # Filter for consumer products
-    consumer_products = []
-    for product in products:
-        # Extract data for caching
-        product_id = product['id']
-        topics = tuple(topic['node']['name'] for topic in product['topics']['edges'])
-        description = product.get('description', '')
-        tagline = product.get('tagline', '')
-        
-        if is_consumer_product(product_id, topics, description, tagline):
-            consumer_products.append(product)
+        return None, {}
+
+def process_products(products: List[Dict[str, Any]], scraped_date: str) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Process and filter products, returning them together with their summary entries."""
+    if not products:
+        return [], []
     
-    # Sort by votes
-    consumer_products.sort(key=lambda x: x['votesCount'], reverse=True)
+    # Filter for consumer products and sort by votes
+    frame = products_frame(products)
+    kept = frame[cached_consumer_mask(frame)].sort_values('votesCount', ascending=False, kind='stable')
     
-    # Add scraping date
-    current_time = datetime.now()
-    for product in consumer_products:
-        product['scraped_date'] = current_time.isoformat()
+    # Gather the kept products into a preallocated list, stamping the scraping date in the same pass
+    consumer_products = [None] * len(kept)
+    for position, index in enumerate(kept.index.tolist()):
+        product = products[index]
+        product['scraped_date'] = scraped_date
+        consumer_products[position] = product
+    
+    # Build summary entries from the filtered frame instead of walking the products again
+    summary_products = [
+        {
+            'name': name,
+            'tagline': tagline,
+            'votes': votes,
+            'url': url,
+            'created_at': created_at,
+            'topics': topics
+        }
+        for name, tagline, votes, url, created_at, topics in zip(
+            *(kept[column].tolist() for column in ('name', 'tagline', 'votesCount', 'url', 'createdAt', 'topics'))
+        )
+    ]
     
-    return consumer_products
+    return consumer_products, summary_products
+
+def dumps(obj: Any) -> bytes:
+    """Encode obj as indented UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+
+def dumps_nested(obj: Any, indent: bytes) -> bytes:
+    """Encode obj like dumps, shifting every line after the first right by indent."""
+    # Newlines only ever appear between tokens, encoded strings escape theirs
+    return dumps(obj).replace(b'\n', b'\n' + indent)
 
-def save_data(products: List[Dict[str, Any]], summary: Dict[str, Any]) -> None:
+def write_json_array(f, items: Iterable[Any], indent: bytes = b'') -> None:
+    """Stream items to a binary file as an indented JSON array, encoding one item at a time."""
+    item_indent = indent + b'  '
+    separator = b'[\n' + item_indent
+    empty = True
+    for item in items:
+        f.write(separator)
+        f.write(dumps_nested(item, item_indent))
+        separator = b',\n' + item_indent
+        empty = False
+    f.write(b'[]' if empty else b'\n' + indent + b']')
+
+def write_summary(f, summary: Dict[str, Any]) -> None:
+    """Write summary to a binary file key by key, streaming its products list."""
+    separator = b'{\n  '
+    for key, value in summary.items():
+        f.write(separator + dumps(key) + b': ')
+        if key == 'products':
+            write_json_array(f, value, b'  ')
+        else:
+            f.write(dumps_nested(value, b'  '))
+        separator = b',\n  '
+    f.write(b'{}' if not summary else b'\n}')
+
+@contextmanager
+def atomic_open(path: Path) -> Iterator[BinaryIO]:
+    """Open a buffered binary writer whose output replaces path only once fully written."""
+    tmp_path = path.with_name(path.name + '.tmp')
+    try:
+        with open(tmp_path, 'wb', buffering=WRITE_BUFFER_SIZE) as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def save_data(products: List[Dict[str, Any]], summary: Dict[str, Any], now: datetime) -> None:
     """Save products and summary to files and clean up old files."""
     # Create data directory if it doesn't exist
-    if not os.path.exists('data'):
-        os.makedirs('data')
+    os.makedirs(DATA_DIR, exist_ok=True)
     
     # Save products to JSON file with timestamp
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    filename = f'data/products_batch_{timestamp}.json'
+    timestamp = now.strftime('%Y%m%d_%H%M%S')
+    filename = DATA_DIR / f'products_batch_{timestamp}.json'
     
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(products, f, indent=2, ensure_ascii=False)
+    with atomic_open(filename) as f:
+        write_json_array(f, products)
     
     # Update summary file
-    summary_file = 'data/summary.json'
-    with open(summary_file, 'w', encoding='utf-8') as f:
-        json.dump(summary, f, indent=2, ensure_ascii=False)
+    summary_file = DATA_DIR / 'summary.json'
+    with atomic_open(summary_file) as f:
+        write_summary(f, summary)
     
     logger.info(f"Data saved to {filename}")
     logger.info(f"Summary updated in {summary_file}")
@@ -171,14 +397,14 @@ def save_data(products: List[Dict[str, Any]], summary: Dict[str, Any]) -> None:
     # Clean up old files
     try:
         # Get list of all batch files except the current one
-        batch_files = glob.glob('data/products_batch_*.json')
+        batch_files = DATA_DIR.glob('products_batch_*.json')
         current_file = os.path.abspath(filename)
         
         for file in batch_files:
             if os.path.abspath(file) != current_file:
                 try:
                     os.remove(file)
-                    logger.debug(f"Cleaned up old file: {file}")
+                    logger.debug("Cleaned up old file: %s", file)
                 except Exception as e:
                     logger.warning(f"Failed to remove old file {file}: {str(e)}")
         
@@ -189,6 +415,11 @@ def save_data(products: List[Dict[str, Any]], summary: Dict[str, Any]) -> None:
 def fetch_products():
     """Fetch products from Product Hunt API and save them to JSON files."""
     try:
+        # Take the clock once so every timestamp in this run agrees
+        now = datetime.now()
+        scraped_date = now.isoformat()
+        posted_after = (now - timedelta(days=LOOKBACK_DAYS)).strftime('%Y-%m-%d')
+        
         all_products = []
         has_next_page = True
         cursor = None
@@ -196,59 +427,54 @@ def fetch_products():
         
         while has_next_page:
             logger.info(f"Fetching page {page}...")
-            response_data = fetch_page(cursor)
+            response_data, response_headers = fetch_page(posted_after, cursor)
             
-            if not response_data or 'data' not in response_data or 'posts' not in response_data['data']:
+            # GraphQL errors come back with "data": null, so resolve posts once defensively
+            posts = ((response_data or {}).get('data') or {}).get('posts')
+            if not posts:
                 logger.error("Invalid response structure")
+                if response_data and response_data.get('errors'):
+                    logger.error(f"GraphQL errors: {response_data['errors']}")
                 break
             
             # Extract products from this page
-            page_products = [edge['node'] for edge in response_data['data']['posts']['edges']]
+            page_products = [edge['node'] for edge in posts['edges']]
             all_products.extend(page_products)
             
             # Check if there are more pages
-            page_info = response_data['data']['posts']['pageInfo']
+            page_info = posts['pageInfo']
             has_next_page = page_info['hasNextPage']
             cursor = page_info['endCursor']
             
             logger.info(f"Fetched {len(page_products)} products from current page")
             logger.info(f"Total products so far: {len(all_products)}")
-            
-            # Add a small delay to avoid rate limiting
-            time.sleep(1)
             page += 1
+            
+            # Only pace when another request follows
+            if has_next_page:
+                wait_for_rate_limit(response_headers)
         
         # Process products
-        consumer_products = process_products(all_products)
+        consumer_products, summary_products = process_products(all_products, scraped_date)
         logger.info(f"Filtered to {len(consumer_products)} consumer products")
         
         # Prepare summary
         summary = {
             'total_products': len(consumer_products),
-            'scraping_date': datetime.now().isoformat(),
+            'scraping_date': scraped_date,
             'date_range': {
-                'start': (datetime.now() - timedelta(days=14)).strftime('%Y-%m-%d'),
-                'end': datetime.now().strftime('%Y-%m-%d')
+                'start': posted_after,
+                'end': now.strftime('%Y-%m-%d')
             },
             'filtering_criteria': {
                 'excluded_topics': sorted(list(EXCLUDED_CATEGORIES)),
                 'excluded_keywords': sorted(list(B2B_KEYWORDS))
             },
-            'products': [
-                {
-                    'name': product['name'],
-                    'tagline': product['tagline'],
-                    'votes': product['votesCount'],
-                    'url': product['url'],
-                    'created_at': product['createdAt'],
-                    'topics': [topic['node']['name'] for topic in product['topics']['edges']]
-                }
-                for product in consumer_products
-            ]
+            'products': summary_products
         }
         
         # Save data
-        save_data(consumer_products, summary)
+        save_data(consumer_products, summary, now)
         logger.info(f"Successfully fetched {len(consumer_products)} consumer products")
         
     except Exception as e:
@@ -1,14 +1,32 @@
-import numpy as np
-import pandas as pd
-import pytest
+import os
 
-from upgini.dataset import Dataset, FileMetrics
-from upgini.ads import FileColumnMeaningType
+# One native thread per xdist worker; must be set before lightgbm/numpy spin up their pools
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+import pytest  # noqa: E402
+
+from upgini.dataset import Dataset, FileMetrics  # noqa: E402
+from upgini.ads import FileColumnMeaningType  # noqa: E402
 
 
 np.random.seed(42)
 
 
+@pytest.fixture(scope="session")
+def parquet_cache():
+    """Read each parquet fixture once per session. Copy the result before mutating it."""
+    cache = {}
+
+    def read(path: str) -> pd.DataFrame:
+        if path not in cache:
+            cache[path] = pd.read_parquet(path)
+        return cache[path]
+
+    return read
+
+
 @pytest.fixture
 def etalon():
     d = 1577836800000
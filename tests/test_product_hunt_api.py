@@ -0,0 +1,156 @@
+import importlib
+import json
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+
+def _product(product_id: str, votes: int, description: str = "A fun game", topics=("Games",)) -> dict:
+    return {
+        "id": product_id,
+        "name": f"Product {product_id}",
+        "tagline": "Play with friends",
+        "description": description,
+        "votesCount": votes,
+        "url": f"https://www.producthunt.com/posts/{product_id}",
+        "createdAt": "2024-01-01T00:00:00Z",
+        "topics": {"edges": [{"node": {"name": name}} for name in topics]},
+    }
+
+
+def _products() -> list:
+    return [
+        _product("1", 10),
+        _product("2", 30, description="Dashboards for your whole team"),
+        _product("3", 20, topics=("Games", "SaaS")),
+        _product("4", 40, description="Recipes from a therapist, ünïcode included"),
+    ]
+
+
+@pytest.fixture
+def api(monkeypatch, tmp_path):
+    monkeypatch.setenv("PRODUCT_HUNT_TOKEN", "test-token")
+    module = importlib.import_module("product_hunt_api")
+    monkeypatch.setattr(module, "DATA_DIR", tmp_path)
+    monkeypatch.setattr(module, "FILTER_CACHE_FILE", tmp_path / "filter_cache.sqlite")
+    return module
+
+
+def _cache_rows(api) -> dict:
+    with sqlite3.connect(api.FILTER_CACHE_FILE) as conn:
+        return {product_id: criteria for product_id, criteria in conn.execute("SELECT id, criteria FROM filter_cache")}
+
+
+@pytest.mark.parametrize(
+    "text,is_b2b",
+    [
+        ("Businesses love it", True),
+        ("teamwork app", True),
+        ("Trade securities", True),
+        ("Companies", True),
+        ("APIs", True),
+        ("Find a therapist", False),
+        ("A rapid companion", False),
+    ],
+)
+def test_b2b_keywords_pattern(api, text: str, is_b2b: bool):
+    assert bool(api.B2B_KEYWORDS_PATTERN.search(text)) == is_b2b
+
+
+def test_consumer_mask(api):
+    frame = api.products_frame(_products())
+
+    assert api.consumer_mask(frame).tolist() == [True, False, False, True]
+
+
+def test_process_products_twice(api):
+    consumer_products, summary_products = api.process_products(_products(), "2024-01-02T00:00:00")
+    assert [product["id"] for product in consumer_products] == ["4", "1"]
+    assert [entry["votes"] for entry in summary_products] == [40, 10]
+    assert all(product["scraped_date"] == "2024-01-02T00:00:00" for product in consumer_products)
+    assert _cache_rows(api) == {product_id: api.FILTER_CRITERIA_HASH for product_id in ["1", "2", "3", "4"]}
+
+    # Same products again are served from the cache
+    cached_products, cached_summary = api.process_products(_products(), "2024-01-02T00:00:00")
+    assert cached_products == consumer_products
+    assert cached_summary == summary_products
+
+    # An edited description is a cache miss
+    products = _products()
+    products[3]["description"] = "Now built for the enterprise"
+    edited_products, _ = api.process_products(products, "2024-01-02T00:00:00")
+    assert [product["id"] for product in edited_products] == ["1"]
+
+
+def test_filter_cache_eviction(api, monkeypatch):
+    api.process_products(_products(), "2024-01-02T00:00:00")
+    with sqlite3.connect(api.FILTER_CACHE_FILE) as conn:
+        conn.execute("UPDATE filter_cache SET last_seen = 0 WHERE id = '1'")
+
+    # Rows not seen within the lookback window are dropped
+    api.process_products(_products()[1:], "2024-01-02T00:00:00")
+    assert set(_cache_rows(api)) == {"2", "3", "4"}
+
+    # So are rows stored under other filter criteria
+    monkeypatch.setattr(api, "FILTER_CRITERIA_HASH", "changed")
+    api.process_products(_products()[1:3], "2024-01-02T00:00:00")
+
+    assert _cache_rows(api) == {"2": "changed", "3": "changed"}
+
+
+def test_save_data_layout(api):
+    now = datetime(2024, 1, 2, 3, 4, 5)
+    stale_batch = api.DATA_DIR / "products_batch_20240101_000000.json"
+    stale_batch.write_text("[]")
+
+    for _ in range(2):
+        consumer_products, summary_products = api.process_products(_products(), now.isoformat())
+        summary = {
+            "total_products": len(consumer_products),
+            "scraping_date": now.isoformat(),
+            "date_range": {"start": "2023-12-19", "end": "2024-01-02"},
+            "filtering_criteria": {"excluded_topics": ["SaaS"], "excluded_keywords": []},
+            "products": summary_products,
+        }
+        api.save_data(consumer_products, summary, now)
+
+    batch = api.DATA_DIR / "products_batch_20240102_030405.json"
+    summary_file = api.DATA_DIR / "summary.json"
+    assert not stale_batch.exists()
+    assert sorted(path.name for path in api.DATA_DIR.iterdir()) == [
+        "filter_cache.sqlite",
+        batch.name,
+        summary_file.name,
+    ]
+
+    with open(batch, encoding="utf-8") as f:
+        assert json.load(f) == consumer_products
+    with open(summary_file, encoding="utf-8") as f:
+        assert json.load(f) == summary
+
+    # Same layout as json.dump(..., indent=2, ensure_ascii=False)
+    assert batch.read_text(encoding="utf-8") == json.dumps(consumer_products, indent=2, ensure_ascii=False)
+    assert summary_file.read_text(encoding="utf-8") == json.dumps(summary, indent=2, ensure_ascii=False)
+
+
+@pytest.mark.parametrize("items", [[], [{"a": [1, {"b": None}]}, "x"]])
+def test_write_json_array_layout(api, tmp_path, items: list):
+    path = tmp_path / "array.json"
+    with open(path, "wb") as f:
+        api.write_json_array(f, iter(items))
+
+    assert path.read_text(encoding="utf-8") == json.dumps(items, indent=2, ensure_ascii=False)
+
+
+def test_atomic_open_keeps_target_on_error(api, tmp_path):
+    path = tmp_path / "summary.json"
+    path.write_bytes(b"{}")
+
+    with pytest.raises(RuntimeError):
+        with api.atomic_open(path) as f:
+            f.write(b"partial")
+            raise RuntimeError("interrupted")
+
+    assert path.read_bytes() == b"{}"
+    assert list(tmp_path.iterdir()) == [path]
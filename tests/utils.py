@@ -2,11 +2,13 @@ import itertools
 import json
 import tempfile
 from random import randint
-from typing import Dict, List, Optional, Union
+from typing import Callable, Dict, List, Optional, Union
 import uuid
 
 import pandas as pd
-from requests_mock import Mocker
+from requests import Response
+from requests_mock import Adapter, Mocker
+from requests_mock.exceptions import NoMockAddress
 
 from upgini.metadata import ProviderTaskMetadataV2
 
@@ -31,6 +33,21 @@ def mock_default_requests(requests_mock: Mocker, url: str):
     )
 
 
+# Precompiles the mock_default_requests routes into one custom matcher that can be
+# registered per test with a single requests_mock.add_matcher call
+def build_default_requests_matcher(url: str) -> Callable[..., Optional[Response]]:
+    adapter = Adapter()
+    mock_default_requests(Mocker(adapter=adapter), url)
+
+    def match(request) -> Optional[Response]:
+        try:
+            return adapter.send(request)
+        except NoMockAddress:
+            return None
+
+    return match
+
+
 def random_id() -> str:
     return str(randint(11111, 99999))
 
@@ -168,7 +185,7 @@ def mock_raw_features(
     requests_mock: Mocker,
     url: str,
     search_task_id: str,
-    mock_features: Union[str, pd.DataFrame],
+    mock_features: Union[str, bytes, pd.DataFrame],
     metrics_calculation=True,
 ):
     ads_search_task_features_id = random_id()
@@ -184,7 +201,11 @@ def mock_raw_features(
             ]
         },
     )
-    if isinstance(mock_features, str):
+    if isinstance(mock_features, bytes):
+        requests_mock.get(
+            url + f"/public/api/v2/search/rawfeatures/{ads_search_task_features_id}/file", content=mock_features
+        )
+    elif isinstance(mock_features, str):
         with open(mock_features, "rb") as f:
             buffer = f.read()
             requests_mock.get(
@@ -200,7 +221,7 @@ def mock_raw_features(
                 )
     else:
         raise Exception(
-            f"Unsupported type of mock features: {type(mock_features)}. Supported only string (path) or DataFrame"
+            f"Unsupported type of mock features: {type(mock_features)}. Supported only path, bytes or DataFrame"
         )
 
 
@@ -208,7 +229,7 @@ def mock_validation_raw_features(
     requests_mock: Mocker,
     url: str,
     validation_search_task_id: str,
-    mock_features: Union[str, pd.DataFrame],
+    mock_features: Union[str, bytes, pd.DataFrame],
     metrics_calculation=False,
 ):
     ads_search_task_features_id = random_id()
@@ -224,7 +245,11 @@ def mock_validation_raw_features(
             ]
         },
     )
-    if isinstance(mock_features, str):
+    if isinstance(mock_features, bytes):
+        requests_mock.get(
+            url + f"/public/api/v2/search/rawfeatures/{ads_search_task_features_id}/file", content=mock_features
+        )
+    elif isinstance(mock_features, str):
         with open(mock_features, "rb") as f:
             buffer = f.read()
             requests_mock.get(
@@ -240,7 +265,7 @@ def mock_validation_raw_features(
                 )
     else:
         raise Exception(
-            f"Unsupported type of mock features: {type(mock_features)}. Supported only string (path) or DataFrame"
+            f"Unsupported type of mock features: {type(mock_features)}. Supported only path, bytes or DataFrame"
         )
 
 